@@ -3,7 +3,7 @@
 Generate random IPv4 destination addresses for testing the Multibit Trie.
 
 Usage:
-    python generate_test_addresses.py <count> <output_file>
+    python generate_test_addresses.py <count> <output_file> [workers]
 
 Examples:
     # 20 addresses for correctness testing
@@ -12,18 +12,40 @@ Examples:
     # 100000 addresses for performance benchmarking
     python generate_test_addresses.py 100000 addresses.txt
 
+    # Same, drawing the addresses in 4 worker processes
+    python generate_test_addresses.py 100000 addresses.txt 4
+
 Addresses are generated uniformly at random over the 32‑bit space and
 written one per line in hexadecimal form (0xXXXXXXXX). The C++ CLI
 also accepts decimal, but hex is convenient and unambiguous.
+
+Each worker draws from its own SFC64 stream spawned from
+SeedSequence(42), so the output is reproducible for a given worker count
+(but differs between worker counts, and from files generated by earlier
+versions of this script).
 """
 
 import sys
-import random
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+# Lines formatted and written per write() call; bounds the size of the
+# formatted text held in memory for very large counts
+WRITE_CHUNK_LINES = 1_000_000
+
+
+def generate_block(seed: np.random.SeedSequence, count: int) -> np.ndarray:
+    """Draw count addresses from an independent stream seeded by seed."""
+    # Any 32 bits of a raw SFC64 word are uniform, so keep the low half
+    # and skip Generator.integers() and its range handling entirely
+    bit_generator = np.random.SFC64(seed)
+    return bit_generator.random_raw(count).astype(np.uint32)
 
 
 def main() -> int:
-    if len(sys.argv) != 3:
-        print("Usage: python generate_test_addresses.py <count> <output_file>")
+    if len(sys.argv) not in (3, 4):
+        print("Usage: python generate_test_addresses.py <count> <output_file> [workers]")
         return 1
 
     try:
@@ -34,16 +56,31 @@ def main() -> int:
         print("Error: <count> must be a positive integer.")
         return 1
 
+    try:
+        workers = int(sys.argv[3]) if len(sys.argv) == 4 else 1
+        if workers <= 0:
+            raise ValueError
+    except ValueError:
+        print("Error: [workers] must be a positive integer.")
+        return 1
+
     output_file = sys.argv[2]
 
-    # Fixed seed for reproducibility of experiments
-    rng = random.Random(42)
+    # Fixed seed for reproducibility of experiments; each worker gets its
+    # own child stream and draws its share of addresses in one bulk call
+    seeds = np.random.SeedSequence(42).spawn(workers)
+    counts = [count // workers + (i < count % workers) for i in range(workers)]
+    if workers == 1:
+        addrs = generate_block(seeds[0], count)
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            addrs = np.concatenate(list(pool.map(generate_block, seeds, counts)))
 
     try:
         with open(output_file, "w", encoding="utf-8") as f:
-            for _ in range(count):
-                addr = rng.getrandbits(32)
-                f.write(f"0x{addr:08X}\n")
+            for start in range(0, count, WRITE_CHUNK_LINES):
+                chunk = addrs[start:start + WRITE_CHUNK_LINES].tolist()
+                f.write("\n".join([f"0x{addr:08X}" for addr in chunk]) + "\n")
     except OSError as e:
         print(f"Error: cannot write to {output_file}: {e}")
         return 1
@@ -4,83 +4,184 @@ Simulation of Multibit Trie for testing and generating sample results.
 This simulates the C++ implementation to verify correctness and generate results.
 """
 
+import os
 import struct
 import random
 import time
 from collections import defaultdict
 
-class TrieNode:
-    def __init__(self, stride):
-        self.children = [None] * (1 << stride)
-        self.next_hop = -1
-        self.has_prefix = False
-        self.stride = stride
+import numpy as np
+
+try:
+    from numba import njit, prange
+except ImportError:
+    # Numba is optional: fall back to running the kernels as plain Python
+    prange = range
+
+    def njit(*args, **kwargs):
+        if len(args) == 1 and callable(args[0]) and not kwargs:
+            return args[0]
+        return lambda func: func
+
+
+def _node_dtype(stride):
+    """Record layout of one trie node: children row and next hop.
+
+    Packing a node into one record means a lookup hop reads its children
+    and next hop from a single contiguous block. Records are padded
+    to a power of two up to a 64-byte cache line, and to whole cache lines
+    beyond that, so no record straddles more lines than it has to.
+    """
+    children_size = 4 * (1 << stride)
+    raw_size = children_size + 4
+    if raw_size <= 64:
+        itemsize = 16
+        while itemsize < raw_size:
+            itemsize *= 2
+    else:
+        itemsize = (raw_size + 63) // 64 * 64
+    return np.dtype({
+        'names': ['children', 'next_hop'],
+        'formats': [(np.int32, (1 << stride,)), np.int32],
+        'offsets': [0, children_size],
+        'itemsize': itemsize,
+    })
+
+def _make_kernels(stride):
+    """Build lookup kernels with the stride, index mask and trip count baked in.
+
+    Numba freezes closure variables as compile-time constants, so each
+    stride gets straight-line shift/mask code over a fixed-length loop.
+    """
+    levels = 32 // stride
+    mask = (1 << stride) - 1
+    
+    @njit
+    def lookup(nodes, address):
+        """LPM traversal over the node records of a MultibitTrie."""
+        node = nodes[0]
+        
+        # Check root (-1 if it stores no prefix)
+        best_hop = node['next_hop']
+        
+        for step in range(levels):
+            index = (address >> (32 - stride * (step + 1))) & mask
+            child = node['children'][index]
+            if child == 0:
+                break
+            node = nodes[child]
+            
+            # Update best match if this node has a prefix
+            next_hop = node['next_hop']
+            if next_hop >= 0:
+                best_hop = next_hop
+        
+        return best_hop
+    
+    @njit(parallel=True)
+    def lookup_many(nodes, addresses, out):
+        """Run lookup for every address in parallel, writing results to out."""
+        for i in prange(addresses.size):
+            out[i] = lookup(nodes, addresses[i])
+    
+    return lookup, lookup_many
+
+
+_lookup_s1, _lookup_many_s1 = _make_kernels(1)
+_lookup_s2, _lookup_many_s2 = _make_kernels(2)
+_lookup_s4, _lookup_many_s4 = _make_kernels(4)
+_lookup_s8, _lookup_many_s8 = _make_kernels(8)
+
+_KERNELS = {
+    1: (_lookup_s1, _lookup_many_s1),
+    2: (_lookup_s2, _lookup_many_s2),
+    4: (_lookup_s4, _lookup_many_s4),
+    8: (_lookup_s8, _lookup_many_s8),
+}
+
+def _ranges(counts):
+    """Concatenation of arange(n) for each n in counts."""
+    total = int(counts.sum())
+    starts = np.repeat(np.cumsum(counts) - counts, counts)
+    return np.arange(total) - starts
 
 class MultibitTrie:
+    """Multibit trie stored as a flat array of node records indexed by node id.
+
+    Node 0 is the root; a child index of 0 means "no child" since the
+    root is never anyone's child. A next_hop of -1 means the node stores
+    no prefix. children and next_hop are field views into the record array.
+    """
+
+    INITIAL_CAPACITY = 1024
+
     def __init__(self, stride):
         if stride not in [1, 2, 4, 8]:
             raise ValueError("Stride must be 1, 2, 4, or 8")
-        self.root = TrieNode(stride)
         self.stride = stride
+        self._set_nodes(self._alloc_nodes(self.INITIAL_CAPACITY))
         self.node_count = 1
+        # Right-shift that brings each stride group down to the low bits,
+        # and the mask that then selects it
+        self.shifts = tuple(32 - stride * (i + 1) for i in range(32 // stride))
+        self.mask = (1 << stride) - 1
+        self._lookup, self._lookup_many = _KERNELS[stride]
+    
+    def _alloc_nodes(self, capacity):
+        """Allocate an array of empty node records."""
+        nodes = np.zeros(capacity, dtype=_node_dtype(self.stride))
+        nodes['next_hop'] = -1
+        return nodes
     
-    def extract_bits(self, value, start_bit, num_bits):
-        """Extract num_bits starting from start_bit (MSB-first)."""
-        mask = (1 << num_bits) - 1
-        return (value >> (32 - start_bit - num_bits)) & mask
+    def _set_nodes(self, nodes):
+        """Adopt a node record array and refresh the per-field views."""
+        self.nodes = nodes
+        self.children = nodes['children']
+        self.next_hop = nodes['next_hop']
+    
+    def _new_node(self):
+        """Allocate a node, doubling the record array when it is full."""
+        if self.node_count == len(self.nodes):
+            nodes = self._alloc_nodes(2 * len(self.nodes))
+            nodes[:self.node_count] = self.nodes[:self.node_count]
+            self._set_nodes(nodes)
+        node = self.node_count
+        self.node_count += 1
+        return node
     
     def insert(self, prefix, length, next_hop):
-        """Insert a prefix into the trie."""
+        """Insert a prefix into the trie.
+
+        The prefix must be left-aligned with no bits set past its length,
+        as produced by load_prefixes; it is not re-aligned here.
+        """
         if length < 0 or length > 32:
             raise ValueError("Length must be between 0 and 32")
+        if next_hop < 0:
+            raise ValueError("Next hop must be non-negative")
+        assert length == 0 or (prefix & ((1 << (32 - length)) - 1)) == 0, \
+            "prefix has bits set beyond its length; pass it left-aligned"
         
         if length == 0:
-            self.root.next_hop = next_hop
-            self.root.has_prefix = True
+            self.next_hop[0] = next_hop
             return
         
-        # Left-align prefix: shift to make it start from MSB, then mask to length
-        if length > 0:
-                    # Simple approach: shift prefix to start at bit position (32-length)
-                    # This assumes prefix value represents the first 'length' bits
-                    # But prefix might have fewer bits, so we left-align it first
-                    if prefix == 0:
-                        # Special case: all zeros
-                        if length < 32:
-                            mask = (0xFFFFFFFF << (32 - length)) & 0xFFFFFFFF
-                            prefix = 0
-                        else:
-                            prefix = 0
-                    else:
-                        # Count significant bits in prefix value
-                        actual_bits = prefix.bit_length()
-                        # Left-align the prefix value to 32 bits
-                        prefix_aligned = (prefix << (32 - actual_bits)) & 0xFFFFFFFF
-                        # Now mask to the specified length
-                        if length < 32:
-                            mask = (0xFFFFFFFF << (32 - length)) & 0xFFFFFFFF
-                            prefix = prefix_aligned & mask
-                        else:
-                            prefix = prefix_aligned
-        
-        current = self.root
-        bits_processed = 0
+        current = 0
+        full_steps, remaining_bits = divmod(length, self.stride)
         
         # Process full stride groups
-        while bits_processed + self.stride <= length:
-            index = self.extract_bits(prefix, bits_processed, self.stride)
+        for s in range(full_steps):
+            index = (prefix >> self.shifts[s]) & self.mask
             
-            if current.children[index] is None:
-                current.children[index] = TrieNode(self.stride)
-                self.node_count += 1
+            if self.children[current, index] == 0:
+                child = self._new_node()
+                self.children[current, index] = child
             
-            current = current.children[index]
-            bits_processed += self.stride
+            current = self.children[current, index]
         
         # Handle remaining bits if length is not a multiple of stride
-        if bits_processed < length:
-            remaining_bits = length - bits_processed
-            index = self.extract_bits(prefix, bits_processed, self.stride)
+        if remaining_bits:
+            index = (prefix >> self.shifts[full_steps]) & self.mask
             
             # Calculate mask for the remaining bits
             mask_shift = self.stride - remaining_bits
@@ -89,124 +190,431 @@ class MultibitTrie:
             
             # Store prefix at current node (shorter match)
             # This ensures we have a match even if we don't go deeper
-            if not current.has_prefix or bits_processed > 0:
-                current.next_hop = next_hop
-                current.has_prefix = True
+            if self.next_hop[current] < 0 or full_steps > 0:
+                self.next_hop[current] = next_hop
             
             # Push prefix to all matching children (leaf pushing)
             for i in range(num_matching_children):
                 child_index = base_index | i
                 
-                if current.children[child_index] is None:
-                    current.children[child_index] = TrieNode(self.stride)
-                    self.node_count += 1
+                if self.children[current, child_index] == 0:
+                    child = self._new_node()
+                    self.children[current, child_index] = child
                 
                 # Always update to allow overriding with more specific prefixes
-                current.children[child_index].next_hop = next_hop
-                current.children[child_index].has_prefix = True
+                child = self.children[current, child_index]
+                self.next_hop[child] = next_hop
         else:
             # Exact match at stride boundary
-            current.next_hop = next_hop
-            current.has_prefix = True
+            self.next_hop[current] = next_hop
+    
+    def build(self, table):
+        """Bulk-insert a PREFIX_DTYPE table into an empty trie.
+
+        Gives the same trie as calling insert for every entry in order of
+        increasing length (so longer prefixes win leaf-pushed slots), but
+        creates nodes and assigns next hops one level at a time with NumPy
+        instead of one prefix at a time. Nodes are numbered breadth-first.
+        """
+        if self.node_count != 1 or self.next_hop[0] >= 0:
+            raise ValueError("build() requires an empty trie")
+        if (table['length'] > 32).any():
+            raise ValueError("Length must be between 0 and 32")
+        if (table['prefix'] & ~prefix_masks(table['length'])).any():
+            raise ValueError("prefix has bits set beyond its length; pass it left-aligned")
+        if (table['next_hop'] < 0).any():
+            raise ValueError("Next hop must be non-negative")
+        
+        stride = self.stride
+        levels = 32 // stride
+        order = np.argsort(table['length'], kind='stable')
+        prefixes = table['prefix'][order].astype(np.int64)
+        lengths = table['length'][order].astype(np.int64)
+        next_hops = table['next_hop'][order]
+        seq = np.arange(len(table))
+        full_steps = lengths // stride
+        remaining_bits = lengths % stride
+        pushed = remaining_bits > 0
+        # Leaf-pushed children per prefix, all sharing the top remaining bits
+        push_counts = np.where(pushed, 1 << (stride - remaining_bits), 0)
+        
+        # Prefixes leaf-pushed into each depth and the keys of the children
+        # they fill; depth 0 (the root) is never a push target
+        push_rows = [np.zeros(len(table), dtype=np.bool_)]
+        push_keys = [np.zeros(0, dtype=np.int64)]
+        for depth in range(1, levels + 1):
+            at_push = pushed & (full_steps + 1 == depth)
+            keys = np.repeat(prefixes[at_push] >> (32 - depth * stride), push_counts[at_push])
+            push_rows.append(at_push)
+            push_keys.append(keys + _ranges(push_counts[at_push]))
+        
+        # Sorted node keys (the address bits leading to a node) per depth
+        level_keys = [np.zeros(1, dtype=np.int64)]
+        level_offsets = [0]
+        node_total = 1
+        for depth in range(1, levels + 1):
+            on_path = full_steps >= depth
+            path_keys = prefixes[on_path] >> (32 - depth * stride)
+            keys = np.unique(np.concatenate([path_keys, push_keys[depth]]))
+            level_keys.append(keys)
+            level_offsets.append(node_total)
+            node_total += len(keys)
+        
+        def node_ids(depth, keys):
+            return level_offsets[depth] + np.searchsorted(level_keys[depth], keys)
+        
+        self._set_nodes(self._alloc_nodes(max(node_total, self.INITIAL_CAPACITY)))
+        self.node_count = node_total
+        for depth in range(1, levels + 1):
+            keys = level_keys[depth]
+            parents = node_ids(depth - 1, keys >> stride)
+            self.children[parents, keys & self.mask] = level_offsets[depth] + np.arange(len(keys))
+        
+        # Unconditional next-hop writes as (node, sequence, next hop)
+        write_nodes, write_seq, write_hops = [], [], []
+        for depth in range(levels + 1):
+            shift = 32 - depth * stride
+            # Exact matches at a stride boundary (depth 0 is the default route)
+            exact = ~pushed & (full_steps == depth)
+            # Longer prefixes also stored at the node they stop in, except at the root
+            stops = pushed & (full_steps == depth) & (depth > 0)
+            hit = exact | stops
+            write_nodes.append(node_ids(depth, prefixes[hit] >> shift))
+            write_seq.append(seq[hit])
+            write_hops.append(next_hops[hit])
+            # Leaf-pushed children one level down
+            at_push = push_rows[depth]
+            write_nodes.append(node_ids(depth, push_keys[depth]))
+            write_seq.append(np.repeat(seq[at_push], push_counts[at_push]))
+            write_hops.append(np.repeat(next_hops[at_push], push_counts[at_push]))
+        write_nodes = np.concatenate(write_nodes)
+        write_seq = np.concatenate(write_seq)
+        write_hops = np.concatenate(write_hops)
+        
+        # Keep the last write per node
+        if len(write_nodes):
+            by_node = np.lexsort((write_seq, write_nodes))
+            write_nodes, write_hops = write_nodes[by_node], write_hops[by_node]
+            last = np.append(write_nodes[1:] != write_nodes[:-1], True)
+            self.next_hop[write_nodes[last]] = write_hops[last]
+        
+        # insert stores a short prefix at the root only if the root is still
+        # empty, so without a default route the first one (in length order) wins
+        if self.next_hop[0] < 0:
+            short = np.flatnonzero(pushed & (full_steps == 0))
+            if len(short):
+                self.next_hop[0] = next_hops[short[0]]
     
     def lookup(self, address):
         """Lookup with LPM."""
-        best_hop = -1
-        current = self.root
+        return int(self._lookup(self.nodes, address))
+    
+    def lookup_many(self, addresses):
+        """Batch LPM lookup of a uint32 address array; returns int32 next hops."""
+        out = np.empty(len(addresses), dtype=np.int32)
+        self._lookup_many(self.nodes, addresses, out)
+        return out
+    
+    def estimate_memory(self):
+        """Estimate memory usage."""
+        # Size per node: one padded record
+        return self.node_count * self.nodes.itemsize
+
+@njit(cache=True)
+def _popcount64(x):
+    """Number of set bits in a uint64 (SWAR; LLVM lowers it to POPCNT)."""
+    x = x - ((x >> np.uint64(1)) & np.uint64(0x5555555555555555))
+    x = (x & np.uint64(0x3333333333333333)) + ((x >> np.uint64(2)) & np.uint64(0x3333333333333333))
+    x = (x + (x >> np.uint64(4))) & np.uint64(0x0F0F0F0F0F0F0F0F)
+    x = x + (x >> np.uint64(8))
+    x = x + (x >> np.uint64(16))
+    x = x + (x >> np.uint64(32))
+    return int(x & np.uint64(0x7F))
+
+
+@njit(cache=True)
+def _bit_is_set(bitmap, bit):
+    """Test one bit of a bitmap stored as a row of uint64 words."""
+    return (bitmap[bit >> 6] >> np.uint64(bit & 63)) & np.uint64(1) != 0
+
+
+@njit(cache=True)
+def _rank(bitmap, bit):
+    """Count the set bits of a uint64 word row below position bit."""
+    count = 0
+    word = bit >> 6
+    for w in range(word):
+        count += _popcount64(bitmap[w])
+    below = (np.uint64(1) << np.uint64(bit & 63)) - np.uint64(1)
+    return count + _popcount64(bitmap[word] & below)
+
+
+@njit(cache=True)
+def _tree_bitmap_lookup(internal, external, child_base, result_base, results,
+                        stride, address):
+    """LPM traversal over the bitmap arrays of a TreeBitmapTrie."""
+    levels = 32 // stride
+    mask = (1 << stride) - 1
+    best_hop = -1
+    node = 0
+    
+    for step in range(levels + 1):
+        # After the last full stride only the node's /0 entry can match
+        bits = 0
+        if step < levels:
+            bits = (address >> (32 - stride * (step + 1))) & mask
         
-        # Check root
-        if self.root.has_prefix:
-            best_hop = self.root.next_hop
+        # Longest prefix stored inside this node that covers the bits
+        for length in range(stride - 1, -1, -1):
+            pos = (1 << length) - 1 + (bits >> (stride - length))
+            if _bit_is_set(internal[node], pos):
+                best_hop = results[result_base[node] + _rank(internal[node], pos)]
+                break
         
-        bits_processed = 0
+        if step == levels or not _bit_is_set(external[node], bits):
+            break
+        node = child_base[node] + _rank(external[node], bits)
+    
+    return best_hop
+
+
+@njit(parallel=True, cache=True)
+def _tree_bitmap_lookup_many(internal, external, child_base, result_base, results,
+                             stride, addresses, out):
+    """Run _tree_bitmap_lookup for every address in parallel."""
+    for i in prange(addresses.size):
+        out[i] = _tree_bitmap_lookup(internal, external, child_base, result_base,
+                                     results, stride, addresses[i])
+
+class _TreeBitmapBuildNode:
+    """Node of the pointer-based tree a TreeBitmapTrie is built from."""
+    
+    __slots__ = ('prefixes', 'children')
+    
+    def __init__(self):
+        self.prefixes = {}  # internal bitmap position -> next hop
+        self.children = {}  # stride-bit index -> child node
+
+class TreeBitmapTrie:
+    """Multibit trie in Tree Bitmap encoding.
+
+    Each node keeps an internal bitmap of the prefixes it stores (lengths
+    0..stride-1 within the node) and an external bitmap of which children
+    exist. Children and next hops are stored densely, so a child or result
+    slot is its base offset plus the popcount of the bitmap below its bit.
+    Prefixes are inserted into a pointer-based tree, which is laid out
+    into the flat bitmap arrays on the first lookup after an insert.
+    """
+
+    def __init__(self, stride):
+        if stride not in [1, 2, 4, 8]:
+            raise ValueError("Stride must be 1, 2, 4, or 8")
+        self.stride = stride
+        self.root = _TreeBitmapBuildNode()
+        self.node_count = 1
+        self.prefix_count = 0
+        self.shifts = tuple(32 - stride * (i + 1) for i in range(32 // stride))
+        self.mask = (1 << stride) - 1
+        self.words = max(1, (1 << stride) // 64)
+        self._built = False
+    
+    def insert(self, prefix, length, next_hop):
+        """Insert a left-aligned prefix into the trie."""
+        if length < 0 or length > 32:
+            raise ValueError("Length must be between 0 and 32")
+        if next_hop < 0:
+            raise ValueError("Next hop must be non-negative")
+        assert length == 0 or (prefix & ((1 << (32 - length)) - 1)) == 0, \
+            "prefix has bits set beyond its length; pass it left-aligned"
         
-        # Traverse the trie
-        while current is not None and bits_processed < 32:
-            index = self.extract_bits(address, bits_processed, self.stride)
-            
-            if current.children[index] is None:
-                break
-            
+        current = self.root
+        for s in range(length // self.stride):
+            index = (prefix >> self.shifts[s]) & self.mask
+            if index not in current.children:
+                current.children[index] = _TreeBitmapBuildNode()
+                self.node_count += 1
             current = current.children[index]
-            bits_processed += self.stride
-            
-            # Update best match if this node has a prefix
-            if current.has_prefix:
-                best_hop = current.next_hop
         
-        return best_hop
+        remaining_bits = length % self.stride
+        bits = 0
+        if remaining_bits:
+            bits = (prefix >> (32 - length)) & ((1 << remaining_bits) - 1)
+        pos = (1 << remaining_bits) - 1 + bits
+        if pos not in current.prefixes:
+            self.prefix_count += 1
+        current.prefixes[pos] = next_hop
+        self._built = False
+    
+    def build(self, table):
+        """Bulk-insert a PREFIX_DTYPE table into an empty trie.
+
+        Accepts the same tables as MultibitTrie.build: the whole table is
+        validated up front, then each row is inserted into the build tree.
+        """
+        if self.node_count != 1 or self.prefix_count:
+            raise ValueError("build() requires an empty trie")
+        if (table['length'] > 32).any():
+            raise ValueError("Length must be between 0 and 32")
+        if (table['prefix'] & ~prefix_masks(table['length'])).any():
+            raise ValueError("prefix has bits set beyond its length; pass it left-aligned")
+        if (table['next_hop'] < 0).any():
+            raise ValueError("Next hop must be non-negative")
+        
+        for prefix, length, next_hop in table.tolist():
+            self.insert(prefix, length, next_hop)
+    
+    def _build(self):
+        """Lay the pointer tree out breadth-first into the bitmap arrays."""
+        self.internal = np.zeros((self.node_count, self.words), dtype=np.uint64)
+        self.external = np.zeros((self.node_count, self.words), dtype=np.uint64)
+        self.child_base = np.zeros(self.node_count, dtype=np.int32)
+        self.result_base = np.zeros(self.node_count, dtype=np.int32)
+        self.results = np.zeros(max(1, self.prefix_count), dtype=np.int32)
+        
+        order = [self.root]
+        result_count = 0
+        for node_id, node in enumerate(order):
+            self.child_base[node_id] = len(order)
+            for index in sorted(node.children):
+                self.external[node_id, index >> 6] |= np.uint64(1 << (index & 63))
+                order.append(node.children[index])
+            
+            self.result_base[node_id] = result_count
+            for pos in sorted(node.prefixes):
+                self.internal[node_id, pos >> 6] |= np.uint64(1 << (pos & 63))
+                self.results[result_count] = node.prefixes[pos]
+                result_count += 1
+        self._built = True
+    
+    def lookup(self, address):
+        """Lookup with LPM."""
+        if not self._built:
+            self._build()
+        return int(_tree_bitmap_lookup(self.internal, self.external, self.child_base,
+                                       self.result_base, self.results, self.stride, address))
+    
+    def lookup_many(self, addresses):
+        """Batch LPM lookup of a uint32 address array; returns int32 next hops."""
+        if not self._built:
+            self._build()
+        out = np.empty(len(addresses), dtype=np.int32)
+        _tree_bitmap_lookup_many(self.internal, self.external, self.child_base,
+                                 self.result_base, self.results, self.stride, addresses, out)
+        return out
     
     def estimate_memory(self):
         """Estimate memory usage."""
-        # Size per node: vector overhead + children pointers + next_hop + has_prefix
-        children_size = 24 + ((1 << self.stride) * 8)  # 24 bytes vector overhead, 8 bytes per pointer
-        node_size = children_size + 4 + 1  # int + bool
-        # 8-byte alignment
-        node_size = ((node_size + 7) // 8) * 8
-        return self.node_count * node_size
+        # Size per node: two bitmaps + child and result base offsets,
+        # plus one next hop per stored prefix
+        node_size = 2 * self.words * 8 + 4 + 4
+        return self.node_count * node_size + self.prefix_count * 4
+
+# Number of address blocks timed separately for the lookup-time distribution
+TIMING_BLOCKS = 100
+
+# Addresses matched per step by reference_lpm_lookup (bounds the hit matrix)
+REFERENCE_BATCH = 256
+
+# Row layout of the prefix table returned by load_prefixes
+PREFIX_DTYPE = np.dtype([('prefix', np.uint32), ('length', np.uint8), ('next_hop', np.int32)])
+
+# Canonical address file line ("0xXXXXXXXX\n") and the tables used to decode it:
+# hex digit byte -> nibble value (0xFF for non-hex bytes), and the shift of
+# each of the 8 nibbles, most significant first
+ADDRESS_LINE_BYTES = 11
+_HEX_LUT = np.full(256, 0xFF, dtype=np.uint8)
+_HEX_LUT[np.frombuffer(b'0123456789', dtype=np.uint8)] = np.arange(10)
+_HEX_LUT[np.frombuffer(b'ABCDEF', dtype=np.uint8)] = np.arange(10, 16)
+_HEX_LUT[np.frombuffer(b'abcdef', dtype=np.uint8)] = np.arange(10, 16)
+_NIBBLE_SHIFTS = np.arange(28, -1, -4, dtype=np.uint32)
 
 def hex_to_int(hex_str):
     """Convert hex string to int."""
     return int(hex_str, 16)
 
-def reference_lpm_lookup(address, table):
-    """Reference LPM using linear search."""
-    best_hop = -1
-    best_length = -1
-    
-    for entry in table:
-        prefix, length, next_hop = entry
-        if length == 0:
-            if best_length < 0:
-                best_hop = next_hop
-                best_length = 0
-            continue
-        
-        mask = 0xFFFFFFFF if length == 32 else ((1 << 32) - 1) << (32 - length)
-        prefix_masked = prefix & mask
-        address_masked = address & mask
-        
-        if prefix_masked == address_masked and length > best_length:
-            best_hop = next_hop
-            best_length = length
+def prefix_masks(lengths):
+    """Network masks for an array of prefix lengths (0..32) as uint32."""
+    lengths = np.asarray(lengths, dtype=np.uint64)
+    masks = (np.uint64(0xFFFFFFFF) << (np.uint64(32) - lengths)) & 0xFFFFFFFF
+    return masks.astype(np.uint32)
+
+def reference_lpm_lookup(addresses, table):
+    """Reference LPM by brute force over the whole table for each address.
+
+    Matches a batch of addresses against every prefix at once and returns
+    an int32 array of next hops (-1 where nothing matches). Ties between
+    prefixes of equal length go to the earliest table entry.
+    """
+    addresses = np.asarray(addresses, dtype=np.uint32)
+    masks = prefix_masks(table['length'])
+    prefixes = table['prefix'] & masks
+    # +1 so a matching default route (length 0) outranks "no match"
+    weights = table['length'].astype(np.int32) + 1
     
-    return best_hop
+    results = np.full(len(addresses), -1, dtype=np.int32)
+    if len(table) == 0:
+        return results
+    for start in range(0, len(addresses), REFERENCE_BATCH):
+        batch = addresses[start:start + REFERENCE_BATCH]
+        hits = (batch[:, None] & masks[None, :]) == prefixes[None, :]
+        scores = hits * weights[None, :]
+        best = scores.argmax(axis=1)
+        matched = scores[np.arange(len(batch)), best] > 0
+        results[start:start + len(batch)] = np.where(matched, table['next_hop'][best], -1)
+    return results
 
 def load_prefixes(filename):
-    """Load prefixes from file."""
-    table = []
+    """Load prefixes from file into a PREFIX_DTYPE structured array.
+
+    Each line holds "<prefix_hex> <length> <next_hop>", where the prefix
+    value carries its `length` network bits in the low-order bits (e.g.
+    "40 13" is the 13-bit pattern 0000001000000). Prefixes are returned
+    left-aligned to the MSB, as MultibitTrie.insert expects. Lines with
+    fewer than three fields are skipped.
+    """
     with open(filename, 'r') as f:
-        for line in f:
-            line = line.strip()
-            if not line:
-                continue
-            parts = line.split()
-            if len(parts) >= 3:
-                prefix_hex = parts[0]
-                length = int(parts[1])
-                next_hop = int(parts[2])
-                prefix = hex_to_int(prefix_hex)
-                
-                # Left-align prefix: same logic as in insert
-                if length > 0:
-                    if prefix == 0:
-                        if length < 32:
-                            mask = (0xFFFFFFFF << (32 - length)) & 0xFFFFFFFF
-                            prefix = 0
-                        else:
-                            prefix = 0
-                    else:
-                        actual_bits = prefix.bit_length()
-                        prefix_aligned = (prefix << (32 - actual_bits)) & 0xFFFFFFFF
-                        if length < 32:
-                            mask = (0xFFFFFFFF << (32 - length)) & 0xFFFFFFFF
-                            prefix = prefix_aligned & mask
-                        else:
-                            prefix = prefix_aligned
-                
-                table.append((prefix, length, next_hop))
+        lines = [line for line in f if len(line.split()) >= 3]
+    if not lines:
+        return np.zeros(0, dtype=PREFIX_DTYPE)
+    table = np.loadtxt(lines, dtype=PREFIX_DTYPE, usecols=(0, 1, 2), ndmin=1,
+                       converters={0: hex_to_int})
+    
+    # Left-align prefix; a /0 shifts out entirely and its mask is 0
+    prefixes = table['prefix'].astype(np.uint64)
+    lengths = table['length'].astype(np.uint64)
+    table['prefix'] = (prefixes << (np.uint64(32) - lengths)) & prefix_masks(lengths)
     return table
 
+def _load_canonical_addresses(filename):
+    """Decode a file of "0xXXXXXXXX\\n" lines in bulk; None if not in that form."""
+    mm = np.memmap(filename, dtype=np.uint8, mode='r')
+    if mm.size % ADDRESS_LINE_BYTES:
+        return None
+    rows = mm.reshape(-1, ADDRESS_LINE_BYTES)
+    if not ((rows[:, 0] == ord('0')) & ((rows[:, 1] | 0x20) == ord('x'))
+            & (rows[:, 10] == ord('\n'))).all():
+        return None
+    nibbles = _HEX_LUT[rows[:, 2:10]]
+    if (nibbles > 0xF).any():
+        return None
+    return (nibbles.astype(np.uint32) << _NIBBLE_SHIFTS).sum(axis=1, dtype=np.uint32)
+
+def load_addresses(filename):
+    """Load whitespace-separated hex addresses (0x optional) into a uint32 array.
+
+    Files in the canonical one-"0xXXXXXXXX"-per-line form written by
+    generate_test_addresses.py are memory-mapped and decoded with a
+    nibble lookup table; anything else is parsed token by token.
+    """
+    if os.path.getsize(filename) == 0:
+        return np.empty(0, dtype=np.uint32)
+    addresses = _load_canonical_addresses(filename)
+    if addresses is not None:
+        return addresses
+    with open(filename, 'rb') as f:
+        tokens = f.read().split()
+    return np.array([int(token, 16) for token in tokens], dtype=np.uint32)
+
 def test_correctness(stride, prefix_file, test_file):
     """Test correctness with reference implementation."""
     print(f"\n=== Testing Correctness (Stride {stride}) ===")
@@ -217,31 +625,27 @@ def test_correctness(stride, prefix_file, test_file):
     
     # Build trie
     trie = MultibitTrie(stride)
-    for prefix, length, next_hop in table:
-        trie.insert(prefix, length, next_hop)
+    trie.build(table)
     
     print(f"Trie built: {trie.node_count} nodes, {trie.estimate_memory()} bytes")
     
+    tree_bitmap = TreeBitmapTrie(stride)
+    tree_bitmap.build(table)
+    
+    print(f"Tree Bitmap built: {tree_bitmap.node_count} nodes, "
+          f"{tree_bitmap.estimate_memory()} bytes")
+    
     # Load test addresses
-    addresses = []
-    with open(test_file, 'r') as f:
-        for line in f:
-            line = line.strip()
-            if not line:
-                continue
-            if line.startswith('0x') or line.startswith('0X'):
-                addr = hex_to_int(line[2:])
-            else:
-                addr = hex_to_int(line)
-            addresses.append(addr)
+    addresses = load_addresses(test_file)
     
     print(f"Testing {len(addresses)} addresses...")
     
     # Test
+    ref_results = reference_lpm_lookup(addresses, table)
     correct = 0
-    for i, addr in enumerate(addresses):
+    for i, addr in enumerate(addresses.tolist()):
         trie_result = trie.lookup(addr)
-        ref_result = reference_lpm_lookup(addr, table)
+        ref_result = int(ref_results[i])
         
         if trie_result == ref_result:
             correct += 1
@@ -250,7 +654,7 @@ def test_correctness(stride, prefix_file, test_file):
             # Debug: find matching prefixes
             if i < 2:  # Only for first 2 mismatches
                 matches = []
-                for p, l, nh in table:
+                for p, l, nh in table.tolist():
                     if l > 0:
                         mask = 0xFFFFFFFF if l == 32 else ((1 << 32) - 1) << (32 - l)
                         if (addr & mask) == (p & mask):
@@ -259,51 +663,64 @@ def test_correctness(stride, prefix_file, test_file):
                 print(f"  Reference matches: {matches[:3]}")
     
     print(f"Correct: {correct}/{len(addresses)} ({100.0 * correct / len(addresses):.2f}%)")
-    return correct == len(addresses)
+    
+    tree_bitmap_correct = int((tree_bitmap.lookup_many(addresses) == ref_results).sum())
+    print(f"Tree Bitmap correct: {tree_bitmap_correct}/{len(addresses)} "
+          f"({100.0 * tree_bitmap_correct / len(addresses):.2f}%)")
+    return correct == len(addresses) and tree_bitmap_correct == len(addresses)
 
-def benchmark(stride, prefix_file, addresses_file):
-    """Run benchmark for a stride."""
+def load_lookup_times(filename):
+    """Read detailed lookup times written by benchmark (.npy or .csv)."""
+    if filename.endswith('.npy'):
+        return np.load(filename)
+    return np.loadtxt(filename, skiprows=1, ndmin=1)
+
+def benchmark(stride, table, addresses, save_npy=False):
+    """Run benchmark for a stride.
+
+    table and addresses are the parsed prefix table and uint32 address
+    array, loaded once and shared across strides. Detailed lookup times
+    go to lookup_times_stride_<stride>.csv, or to a binary .npy file of
+    the same name when save_npy is set.
+    """
     print(f"\n--- Benchmarking Stride {stride} ---")
     
-    # Load and build
-    table = load_prefixes(prefix_file)
+    # Build
     trie = MultibitTrie(stride)
-    for prefix, length, next_hop in table:
-        trie.insert(prefix, length, next_hop)
-    
-    # Load addresses
-    addresses = []
-    with open(addresses_file, 'r') as f:
-        for line in f:
-            line = line.strip()
-            if not line:
-                continue
-            if line.startswith('0x') or line.startswith('0X'):
-                addr = hex_to_int(line[2:])
-            else:
-                addr = hex_to_int(line)
-            addresses.append(addr)
-    
-    # Run lookups with timing
-    lookup_times = []
-    for addr in addresses:
+    trie.build(table)
+    
+    # Warm up the kernel so JIT compilation is not timed
+    trie.lookup_many(addresses[:1])
+    
+    # Per-block timing: each sample is the average cost of one lookup
+    # within a block, so the timer is not inside the measurement. All
+    # statistics, including the average, describe these same samples.
+    blocks = np.array_split(addresses, min(TIMING_BLOCKS, len(addresses)))
+    block_times = np.empty(len(blocks), dtype=np.int64)
+    for i, block in enumerate(blocks):
         start = time.perf_counter_ns()
-        trie.lookup(addr)
+        trie.lookup_many(block)
         end = time.perf_counter_ns()
-        lookup_times.append(end - start)
+        block_times[i] = end - start
+    lookup_times = block_times / np.array([len(block) for block in blocks])
     
     # Calculate statistics
-    min_time = min(lookup_times)
-    max_time = max(lookup_times)
-    avg_time = sum(lookup_times) / len(lookup_times)
-    variance = sum((t - avg_time) ** 2 for t in lookup_times) / len(lookup_times)
-    std_time = variance ** 0.5
+    avg_time = float(block_times.sum() / len(addresses))
+    min_time = float(lookup_times.min())
+    max_time = float(lookup_times.max())
+    std_time = float(lookup_times.std())
     
     node_count = trie.node_count
     estimated_bytes = trie.estimate_memory()
     
+    # Same table in Tree Bitmap encoding, for comparison
+    tree_bitmap = TreeBitmapTrie(stride)
+    tree_bitmap.build(table)
+    tree_bitmap_bytes = tree_bitmap.estimate_memory()
+    
     print(f"Node count: {node_count:,}")
     print(f"Estimated memory: {estimated_bytes:,} bytes ({estimated_bytes / (1024*1024):.2f} MB)")
+    print(f"Tree Bitmap memory: {tree_bitmap_bytes:,} bytes ({tree_bitmap_bytes / (1024*1024):.2f} MB)")
     print(f"Min time: {min_time:.2f} ns")
     print(f"Max time: {max_time:.2f} ns")
     print(f"Avg time: {avg_time:.2f} ns")
@@ -320,12 +737,13 @@ def benchmark(stride, prefix_file, addresses_file):
     print(f"Results saved to {filename}")
     
     # Also save detailed lookup times
-    detail_filename = f"lookup_times_stride_{stride}.csv"
-    with open(detail_filename, 'w', newline='') as f:
-        writer = csv.writer(f)
-        writer.writerow(['lookup_time_ns'])
-        for t in lookup_times:
-            writer.writerow([t])
+    if save_npy:
+        detail_filename = f"lookup_times_stride_{stride}.npy"
+        np.save(detail_filename, lookup_times)
+    else:
+        detail_filename = f"lookup_times_stride_{stride}.csv"
+        np.savetxt(detail_filename, lookup_times, fmt='%.3f',
+                   header='lookup_time_ns', comments='')
     print(f"Detailed lookup times saved to {detail_filename}")
     
     return {
@@ -346,13 +764,18 @@ if __name__ == "__main__":
         test_correctness(4, "prefix-list.txt", "correctness_test.txt")
     elif len(sys.argv) > 1 and sys.argv[1] == "benchmark":
         # Full benchmark
+        save_npy = "--npy" in sys.argv[2:]
         print("=== Running Benchmark ===")
+        table = load_prefixes("prefix-list.txt")
+        addresses = load_addresses("addresses.txt")
         results = []
         for stride in [1, 2, 4, 8]:
-            result = benchmark(stride, "prefix-list.txt", "addresses.txt")
+            result = benchmark(stride, table, addresses, save_npy)
             results.append(result)
         print("\n=== Benchmark Complete ===")
     else:
         print("Usage:")
         print("  python test_trie_simulation.py test       - Run correctness test")
         print("  python test_trie_simulation.py benchmark   - Run full benchmark")
+        print("  python test_trie_simulation.py benchmark --npy")
+        print("                                             - Same, lookup times saved as .npy")